@@ -1,13 +1,28 @@
 #!/usr/bin/env python3
 """Minimal Claude agent with continuous chat and dash tool integration."""
 
+import atexit
+import collections
+import heapq
+import itertools
 import json
 import subprocess
 import sys
 import os
+import threading
+import time
+from concurrent.futures import Future
 
 import anthropic
 
+from dash_rpc import DashMCPError, error_text, response_text, result_text
+from dash_rpc import dumps as _rpc_dumps, loads as _rpc_loads
+
+try:
+    import jsonschema_rs
+except ImportError:  # optional: without it arguments go to dashmcp unchecked
+    jsonschema_rs = None
+
 DASHMCP = "/dash/.claude/mcp/dashmcp"
 MODEL = os.environ.get("DASH_MODEL", "claude-opus-4-6")
 
@@ -188,54 +203,299 @@ TOOLS = [
     },
 ]
 
+# Compiled input_schema validators, so malformed model arguments fail here
+# instead of costing a dashmcp round-trip
+_VALIDATORS = (
+    {t["name"]: jsonschema_rs.validator_for(t["input_schema"]) for t in TOOLS}
+    if jsonschema_rs is not None
+    else {}
+)
+
+
+# Tool defs in Anthropic API format, built once at import
+_API_TOOLS = tuple(
+    {"name": t["name"], "description": t["description"], "input_schema": t["input_schema"]}
+    for t in TOOLS
+)
+
+# Tools without side effects. stream_turn starts these as soon as their block
+# is complete; the rest wait until the turn really ends in tool_use, since a
+# turn cut off by max_tokens never sends its tool results back.
+_EARLY_TOOLS = frozenset({
+    "working_set", "tasks", "summary", "search", "context_pack", "query", "read", "activity", "prompt",
+})
+
+
+class _DashMCP:
+    """Long-lived dashmcp child speaking newline-delimited JSON-RPC.
+
+    The process is spawned on first use and nobody waits for its handshake:
+    initialize is written first and later requests queue behind it in the
+    pipe, since dashmcp answers initialize before it reads the next line, so
+    submit() returns at once even while dashmcp is still connecting to the
+    database. Requests are pipelined:
+    submit() writes a frame and returns a Future that a reader thread
+    resolves when the response with the same id arrives, so several tool
+    calls can be in flight on one pipe. The pipes are binary: responses go
+    from bytes to the JSON parser without a str decode.
+
+    One watchdog thread expires requests from a deadline heap. A single slow
+    call just times out and its late response is dropped; after
+    MAX_TIMEOUTS expiries in a row with no response in between the child is
+    considered wedged and killed, and the next call respawns it.
+    """
+
+    MAX_TIMEOUTS = 3
+
+    def __init__(self):
+        self._lock = threading.Lock()        # spawning and stdin writes
+        self._state_lock = threading.Lock()  # _pending, _dead and _timeouts
+        self._ids = itertools.count(1)
+        self._pending = {}  # id -> Future awaiting that response
+        self._dead = True
+        self._timeouts = 0  # consecutive expiries without a response
+        self._deadlines = []  # heap of (deadline, id, timeout, proc)
+        self._deadline_cv = threading.Condition()
+        self._watchdog = None
+        self._stderr_tail = collections.deque(maxlen=20)
+        self.proc = None
+        atexit.register(self.close)
+
+    def _spawn(self):
+        """Start a fresh child and send initialize. Caller holds self._lock."""
+        try:
+            self.proc = subprocess.Popen(
+                [DASHMCP],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except OSError as e:
+            raise DashMCPError(f"Could not start dashmcp: {e}")
+        self._stderr_tail.clear()
+        with self._state_lock:
+            self._pending = {}
+            self._dead = False
+            self._timeouts = 0
+        # Drain stderr so a chatty child can never block on a full pipe.
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, args=(self.proc,), daemon=True)
+        self._stderr_thread.start()
+        threading.Thread(target=self._read_loop, args=(self.proc,), daemon=True).start()
+
+        def initialized(f, proc=self.proc):
+            if isinstance(f.exception(), subprocess.TimeoutExpired) and proc.poll() is None:
+                proc.kill()  # hung at startup: the reader marks it dead
+
+        self._write("initialize", {}, 60).add_done_callback(initialized)
+
+    def _drain_stderr(self, proc):
+        for line in proc.stderr:
+            self._stderr_tail.append(line)
+
+    def stderr(self) -> str:
+        if self.proc.poll() is not None:
+            self._stderr_thread.join(timeout=1)  # let the drain catch the last words
+        return b"".join(self._stderr_tail)[-500:].decode("utf-8", "replace")
+
+    def _read_loop(self, proc):
+        for line in proc.stdout:
+            try:
+                resp = _rpc_loads(line)
+            except ValueError:
+                continue  # stray log output on stdout
+            if not isinstance(resp, dict):
+                continue
+            with self._state_lock:
+                fut = self._pending.pop(resp.get("id"), None)
+                self._timeouts = 0
+            if fut is not None:
+                fut.set_result(resp)
+
+        # stdout closed: reap the child and fail whatever is still waiting.
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        err = DashMCPError("No response from dashmcp", self.stderr())
+        with self._state_lock:
+            self._dead = True
+            pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            fut.set_exception(err)
+
+    def _resolve(self, req_id: int, exc: Exception):
+        with self._state_lock:
+            fut = self._pending.pop(req_id, None)
+        if fut is not None:
+            fut.set_exception(exc)
+
+    def _watch(self, req_id: int, timeout: float):
+        with self._deadline_cv:
+            heapq.heappush(self._deadlines, (time.monotonic() + timeout, req_id, timeout, self.proc))
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watch_loop, daemon=True)
+                self._watchdog.start()
+            self._deadline_cv.notify()
+
+    def _watch_loop(self):
+        while True:
+            with self._deadline_cv:
+                while True:
+                    wait = self._deadlines[0][0] - time.monotonic() if self._deadlines else None
+                    if wait is not None and wait <= 0:
+                        break
+                    self._deadline_cv.wait(wait)
+                _, req_id, timeout, proc = heapq.heappop(self._deadlines)
+            self._expire(req_id, timeout, proc)
+
+    def _expire(self, req_id: int, timeout: float, proc):
+        with self._state_lock:
+            fut = self._pending.pop(req_id, None)
+            if fut is None:
+                return  # already answered
+            self._timeouts += 1
+            wedged = self._timeouts >= self.MAX_TIMEOUTS
+        if wedged and proc.poll() is None:
+            proc.kill()  # the reader sees EOF and marks the child dead
+        fut.set_exception(subprocess.TimeoutExpired([DASHMCP], timeout))
+
+    def _write(self, method: str, params: dict, timeout: float) -> Future:
+        """Register and send one request. Caller holds self._lock."""
+        req_id = next(self._ids)
+        fut = Future()
+        try:
+            frame = _rpc_dumps({"jsonrpc": "2.0", "method": method, "params": params, "id": req_id}) + b"\n"
+        except (TypeError, ValueError) as e:  # e.g. an int wider than 64 bits in model arguments
+            fut.set_exception(DashMCPError(f"Could not encode {method} request: {e}"))
+            return fut
+
+        with self._state_lock:
+            dead = self._dead
+            if not dead:
+                self._pending[req_id] = fut
+        if dead:  # stderr() may wait for the drain thread: not under the lock
+            fut.set_exception(DashMCPError("No response from dashmcp", self.stderr()))
+            return fut
+
+        self._watch(req_id, timeout)
+
+        try:
+            self.proc.stdin.write(frame)
+            self.proc.stdin.flush()
+        except (OSError, ValueError) as e:  # ValueError: stdin already closed
+            self._resolve(req_id, DashMCPError(f"Write to dashmcp failed: {e}", self.stderr()))
+        return fut
+
+    def submit(self, method: str, params: dict, timeout: float = 60) -> Future:
+        """Send one JSON-RPC request; the Future resolves with its response."""
+        with self._lock:
+            try:
+                if self._dead:
+                    self._spawn()
+            except DashMCPError as e:
+                fut = Future()
+                fut.set_exception(e)
+                return fut
+            return self._write(method, params, timeout)
+
+    def close(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+
+
+_dashmcp = _DashMCP()
+
+
+def _then(fut: Future, fn) -> Future:
+    """Return a Future resolved with fn(fut) once fut is done."""
+    out = Future()
+
+    def done(f):
+        try:
+            out.set_result(fn(f))
+        except Exception as e:
+            out.set_exception(e)
+
+    fut.add_done_callback(done)
+    return out
+
+
+def _tool_text(fut: Future) -> str:
+    exc = fut.exception()
+    if exc is not None:
+        return error_text(exc)
+    return response_text(fut.result())
+
+
+def _check_args(name: str, args: dict):
+    """Return an error string if args do not match the tool's input_schema, else None."""
+    validator = _VALIDATORS.get(name)
+    if validator is None or validator.is_valid(args):
+        return None
+    reason = next(validator.iter_errors(args)).message
+    return json.dumps({"error": f"Invalid arguments for {name}: {reason}"})
+
+
+def submit_tool(name: str, args: dict) -> Future:
+    """Start a tool call via dashmcp; the Future resolves with the result text."""
+    invalid = _check_args(name, args)
+    if invalid is not None:
+        fut = Future()
+        fut.set_result(invalid)
+        return fut
+    return _then(_dashmcp.submit("tools/call", {"name": name, "arguments": args}), _tool_text)
+
 
 def run_tool(name: str, args: dict) -> str:
     """Call a tool via dashmcp JSON-RPC and return the result text."""
-    init_req = {"jsonrpc": "2.0", "method": "initialize", "params": {}, "id": 0}
-    call_req = {
-        "jsonrpc": "2.0",
-        "method": "tools/call",
-        "params": {"name": name, "arguments": args},
-        "id": 1,
-    }
-    payload = json.dumps(init_req) + "\n" + json.dumps(call_req) + "\n"
-
-    try:
-        proc = subprocess.run(
-            [DASHMCP],
-            input=payload,
-            capture_output=True,
-            text=True,
-            timeout=60,
-        )
-    except subprocess.TimeoutExpired:
-        return json.dumps({"error": "Tool call timed out after 60s"})
-
-    # Parse the second line (tools/call response)
-    lines = [l for l in proc.stdout.strip().split("\n") if l.strip()]
-    if len(lines) < 2:
-        return json.dumps({"error": "No response from dashmcp", "stderr": proc.stderr[:500]})
-
-    try:
-        resp = json.loads(lines[1])
-    except json.JSONDecodeError:
-        return json.dumps({"error": "Invalid JSON from dashmcp", "raw": lines[1][:500]})
-
-    if "error" in resp:
-        return json.dumps(resp["error"])
-
-    # Extract text content from MCP tool result
-    result = resp.get("result", {})
-    content = result.get("content", [])
-    texts = [item.get("text", "") for item in content if item.get("type") == "text"]
-    return "\n".join(texts) if texts else json.dumps(result)
-
-
-def load_system_prompt() -> str:
-    """Build system prompt from working_set context."""
-    print("  [INIT] Loading context from graph...")
-    ws = run_tool("working_set", {})
-
+    return submit_tool(name, args).result()
+
+
+def run_tools_batch(calls: list, max_concurrent: int = 0, stop_on_error: bool = False) -> list:
+    """Run several (name, args) tool calls in one dashmcp batch/call round-trip.
+
+    Returns the result texts in call order. max_concurrent=1 runs the calls
+    one after another, in order. Falls back to one tools/call per tool if
+    dashmcp does not know batch/call.
+    """
+    texts = [_check_args(name, args) for name, args in calls]
+    pending = [(i, name, args) for i, (name, args) in enumerate(calls) if texts[i] is None]
+    if len(pending) == 1:
+        i, name, args = pending[0]
+        texts[i] = run_tool(name, args)
+    elif pending:
+        params = {
+            "calls": [{"name": name, "arguments": args} for _, name, args in pending],
+            "maxConcurrent": max_concurrent,
+            "stopOnError": stop_on_error,
+        }
+        fut = _dashmcp.submit("batch/call", params)
+        if fut.exception() is None and fut.result().get("error", {}).get("code") == -32601:
+            # Method not found: older dashmcp. Resubmit from here, never from
+            # a Future callback, which would write stdin on the reader thread.
+            if max_concurrent == 1:
+                batch = [run_tool(name, args) for _, name, args in pending]
+            else:
+                batch = [f.result() for f in [submit_tool(name, args) for _, name, args in pending]]
+        elif fut.exception() is not None:
+            batch = [error_text(fut.exception())] * len(pending)
+        elif "error" in fut.result():
+            batch = [json.dumps(fut.result()["error"])] * len(pending)
+        else:
+            results = fut.result().get("result", {}).get("results", [])
+            batch = [result_text(r) for r in results]
+            batch += [json.dumps({"error": "Missing result in batch response"})] * (len(pending) - len(batch))
+        for (i, _, _), text in zip(pending, batch):
+            texts[i] = text
+    return texts
+
+
+_SYSTEM_PROMPT_TTL = 300  # seconds a fetched working set is reused
+_SYSTEM_PROMPT_CACHE = {}  # time bucket -> prompt
+
+
+def _system_prompt(ws: str) -> str:
     return f"""Du är dash-agenten — en AI-assistent kopplad till ett grafsystem som spårar projekt, tasks, insikter och beslut.
 
 Du har tillgång till dash-verktyg för att läsa och skriva till grafen. Använd dem aktivt.
@@ -247,6 +507,28 @@ Svara på svenska om inte användaren skriver på engelska.
 """
 
 
+def start_system_prompt() -> Future:
+    """Load the system prompt from working_set in the background (cached per time bucket)."""
+    bucket = int(time.time() // _SYSTEM_PROMPT_TTL)
+    prompt = _SYSTEM_PROMPT_CACHE.get(bucket)
+    if prompt is not None:
+        fut = Future()
+        fut.set_result(prompt)
+        return fut
+
+    print("  [INIT] Loading context from graph...")
+
+    def build(f):
+        prompt = _system_prompt(_tool_text(f))
+        # Only a real working set is worth reusing; an error is retried next time.
+        if f.exception() is None and "error" not in f.result() and not f.result().get("result", {}).get("isError"):
+            _SYSTEM_PROMPT_CACHE.clear()
+            _SYSTEM_PROMPT_CACHE[bucket] = prompt
+        return prompt
+
+    return _then(_dashmcp.submit("tools/call", {"name": "working_set", "arguments": {}}), build)
+
+
 def format_tool_call(name: str, args: dict) -> str:
     """Format tool call for display."""
     args_str = json.dumps(args, ensure_ascii=False)
@@ -255,16 +537,67 @@ def format_tool_call(name: str, args: dict) -> str:
     return f"  [TOOL] {name}({args_str})"
 
 
+def stream_turn(client, system: str, messages: list):
+    """Stream one assistant turn, printing text as it arrives.
+
+    Read-only tool_use blocks (_EARLY_TOOLS) are sent to dashmcp as soon as
+    their input is complete, so they run while the model is still generating.
+    If the turn then stops for another reason than tool_use their results are
+    simply unused; tools with side effects are left for the caller to start
+    once stop_reason is known. Returns (final_message, {tool_use_id: future}).
+    """
+    tool_starts = {}  # block index -> tool_use content block
+    tool_json = {}    # block index -> accumulated input_json fragments
+    futures = {}
+    mid_line = False
+
+    with client.messages.stream(
+        model=MODEL,
+        # Tools and system prompt are identical on every call of a session;
+        # the cache breakpoint lets the API reuse that prefix.
+        system=[{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}],
+        messages=messages,
+        tools=_API_TOOLS,
+        max_tokens=4096,
+    ) as stream:
+        for event in stream:
+            if event.type == "content_block_start":
+                if event.content_block.type == "tool_use":
+                    tool_starts[event.index] = event.content_block
+                    tool_json[event.index] = []
+                elif event.content_block.type == "text":
+                    print()
+            elif event.type == "content_block_delta":
+                if event.delta.type == "text_delta":
+                    print(event.delta.text, end="", flush=True)
+                    mid_line = True
+                elif event.delta.type == "input_json_delta":
+                    tool_json[event.index].append(event.delta.partial_json)
+            elif event.type == "content_block_stop" and event.index in tool_starts:
+                block = tool_starts.pop(event.index)
+                raw = "".join(tool_json.pop(event.index))
+                try:
+                    args = json.loads(raw) if raw else {}
+                except ValueError:
+                    continue  # input cut off by max_tokens; the turn ends without tool_use
+                if mid_line:
+                    print()
+                    mid_line = False
+                print(format_tool_call(block.name, args))
+                if block.name in _EARLY_TOOLS:
+                    futures[block.id] = submit_tool(block.name, args)
+
+        response = stream.get_final_message()
+
+    if mid_line:
+        print("\n")
+    return response, futures
+
+
 def chat():
     client = anthropic.Anthropic()
     messages = []
-    system = load_system_prompt()
-
-    # Convert our tool defs to Anthropic API format
-    api_tools = [
-        {"name": t["name"], "description": t["description"], "input_schema": t["input_schema"]}
-        for t in TOOLS
-    ]
+    system_future = start_system_prompt()
 
     print("  [READY] Skriv 'quit' för att avsluta.\n")
 
@@ -283,55 +616,49 @@ def chat():
             continue
 
         messages.append({"role": "user", "content": user_input})
+        system = system_future.result()  # fetched while the user was typing
 
         # API call with tool use loop
         try:
-            response = client.messages.create(
-                model=MODEL,
-                system=system,
-                messages=messages,
-                tools=api_tools,
-                max_tokens=4096,
-            )
+            response, futures = stream_turn(client, system, messages)
         except anthropic.APIError as e:
             print(f"  [ERROR] API: {e}")
             messages.pop()  # Remove failed user message
             continue
 
-        # Tool use loop
+        # Tool use loop: calls were started during streaming, collect in original order
         while response.stop_reason == "tool_use":
             tool_blocks = [b for b in response.content if b.type == "tool_use"]
             messages.append({"role": "assistant", "content": response.content})
 
+            # Tools with side effects were held back during streaming. They
+            # are all known now, so one batch/call delays nothing; it runs them
+            # one at a time, in the order the model asked for them.
+            held = [b for b in tool_blocks if b.id not in futures]
+            texts = dict(zip(
+                (b.id for b in held),
+                run_tools_batch([(b.name, b.input) for b in held], max_concurrent=1),
+            ))
+
             tool_results = []
             for block in tool_blocks:
-                print(format_tool_call(block.name, block.input))
-                result = run_tool(block.name, block.input)
                 tool_results.append({
                     "type": "tool_result",
                     "tool_use_id": block.id,
-                    "content": result,
+                    "content": texts[block.id] if block.id in texts else futures[block.id].result(),
                 })
 
             messages.append({"role": "user", "content": tool_results})
 
             try:
-                response = client.messages.create(
-                    model=MODEL,
-                    system=system,
-                    messages=messages,
-                    tools=api_tools,
-                    max_tokens=4096,
-                )
+                response, futures = stream_turn(client, system, messages)
             except anthropic.APIError as e:
                 print(f"  [ERROR] API: {e}")
                 break
 
-        # Print text response
-        text_parts = [b.text for b in response.content if hasattr(b, "text")]
-        if text_parts:
+        # Text was already printed while streaming
+        if any(hasattr(b, "text") for b in response.content):
             messages.append({"role": "assistant", "content": response.content})
-            print("\n" + "\n".join(text_parts) + "\n")
 
 
 if __name__ == "__main__":
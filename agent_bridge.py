@@ -5,11 +5,19 @@ Reads OpenAI-format JSON payload from stdin.
 No MCP tools — tool definitions come via system prompt, tool calls
 are emitted as SSE events for Go-side execution.
 Outputs OpenAI-compatible SSE events to stdout.
+
+call_dash() is available for bridge-side helper calls to dashmcp that must
+not stall the event loop.
 """
 
 import asyncio
+import collections
+import itertools
 import json
+import os
+import subprocess
 import sys
+import time
 
 from claude_code_sdk import (
     query,
@@ -21,15 +29,68 @@ from claude_code_sdk import (
     ToolUseBlock,
 )
 
+import dash_rpc
+
+try:
+    from claude_code_sdk import StreamEvent
+except ImportError:  # older SDK: only AssistantMessage snapshots
+    StreamEvent = None
+
+
+class _Emitter:
+    """Coalesces SSE frames into few stdout writes.
+
+    Frames are buffered and written once the buffer reaches MAX_BUFFER
+    bytes or MAX_DELAY seconds have passed since the last write. A timer on
+    the running event loop flushes leftovers when the SDK stream stalls.
+    """
+
+    MAX_BUFFER = 16384
+    MAX_DELAY = 0.01
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.last_flush = time.monotonic()
+        self._timer = None
+
+    def write(self, frame: bytes):
+        self.buf += frame
+        if len(self.buf) >= self.MAX_BUFFER or time.monotonic() - self.last_flush >= self.MAX_DELAY:
+            self.flush()
+        elif self._timer is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.flush()
+                return
+            self._timer = loop.call_later(self.MAX_DELAY, self.flush)
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.buf:
+            # One raw write(2) per batch, straight to the pipe fd; the
+            # BufferedWriter would only copy the bytes again.
+            fd = sys.stdout.fileno()
+            written = 0
+            with memoryview(self.buf) as view:
+                while written < len(view):
+                    written += os.write(fd, view[written:])
+            self.buf.clear()
+        self.last_flush = time.monotonic()
+
+
+_emitter = _Emitter()
+
 
 def emit(data):
-    """Write one SSE event to stdout."""
-    sys.stdout.write(f"data: {json.dumps(data, ensure_ascii=False)}\n")
-    sys.stdout.flush()
+    """Queue one SSE event for stdout."""
+    _emitter.write(b"data: " + dash_rpc.dumps(data) + b"\n")
 
 
 def emit_done(prompt_tok=0, comp_tok=0):
-    """Emit usage + DONE sentinel."""
+    """Emit usage + DONE sentinel and flush everything."""
     if prompt_tok or comp_tok:
         emit({
             "choices": [],
@@ -39,8 +100,144 @@ def emit_done(prompt_tok=0, comp_tok=0):
                 "total_tokens": prompt_tok + comp_tok,
             },
         })
-    sys.stdout.write("data: [DONE]\n")
-    sys.stdout.flush()
+    _emitter.write(b"data: [DONE]\n")
+    _emitter.flush()
+
+
+DASHMCP = "/dash/.claude/mcp/dashmcp"
+
+
+class _AsyncDashMCP:
+    """Persistent dashmcp child driven from the event loop.
+
+    Requests are pipelined: each caller writes its frame and awaits a future
+    that one reader task resolves by response id, so concurrent tool calls
+    never block SSE emission or each other.
+    """
+
+    READ_LIMIT = 64 * 1024 * 1024  # one response line can hold a whole file
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._ids = itertools.count(1)
+        self._proc = None
+        self._reader = None  # task reading self._proc; done once the child is gone
+        self._pending = {}   # id -> future, per process
+        self._stderr_task = None  # held so the drain task is not garbage-collected
+        self._stderr_tail = collections.deque(maxlen=20)
+
+    async def _ensure(self):
+        async with self._lock:
+            if self._reader is not None and not self._reader.done():
+                return
+            try:
+                self._proc = await asyncio.create_subprocess_exec(
+                    DASHMCP,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    limit=self.READ_LIMIT,
+                )
+            except OSError as e:
+                raise dash_rpc.DashMCPError(f"Could not start dashmcp: {e}")
+            self._pending = {}
+            self._stderr_tail.clear()
+            self._stderr_task = asyncio.create_task(self._drain_stderr(self._proc))
+            self._reader = asyncio.create_task(self._read_loop(self._proc, self._pending))
+            try:
+                await self.request("initialize", {})
+            except BaseException:
+                # Never reuse a child that did not finish the handshake.
+                self._kill(self._proc)
+                self._reader.cancel()  # its cleanup reaps the child
+                self._reader = None
+                raise
+
+    async def _drain_stderr(self, proc):
+        async for line in proc.stderr:
+            self._stderr_tail.append(line)
+
+    def stderr(self):
+        return b"".join(self._stderr_tail)[-500:].decode("utf-8", "replace")
+
+    @staticmethod
+    def _kill(proc):
+        if proc.returncode is None:
+            proc.kill()
+
+    async def _read_loop(self, proc, pending):
+        try:
+            while True:
+                line = await proc.stdout.readuntil(b"\n")
+                try:
+                    resp = dash_rpc.loads(line)
+                except ValueError:
+                    continue  # stray log output on stdout
+                if isinstance(resp, dict):
+                    fut = pending.pop(resp.get("id"), None)
+                    if fut is not None and not fut.done():
+                        fut.set_result(resp)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            # Whatever ended the loop, this child is unusable: make sure it is gone.
+            self._kill(proc)
+            proc.stdin.close()
+            await proc.wait()
+            err = dash_rpc.DashMCPError("No response from dashmcp", self.stderr())
+            for fut in pending.values():
+                if not fut.done():
+                    fut.set_exception(err)
+            pending.clear()
+
+    async def request(self, method, params, timeout=60):
+        """Send one JSON-RPC request and await its response."""
+        req_id = next(self._ids)
+        try:
+            frame = dash_rpc.dumps({"jsonrpc": "2.0", "method": method, "params": params, "id": req_id}) + b"\n"
+        except (TypeError, ValueError) as e:
+            raise dash_rpc.DashMCPError(f"Could not encode {method} request: {e}")
+        pending = self._pending
+        fut = asyncio.get_running_loop().create_future()
+        pending[req_id] = fut
+        try:
+            self._proc.stdin.write(frame)
+            await self._proc.stdin.drain()
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            raise subprocess.TimeoutExpired([DASHMCP], timeout)
+        except (OSError, RuntimeError) as e:  # RuntimeError: transport already closed
+            raise dash_rpc.DashMCPError(f"Write to dashmcp failed: {e}", self.stderr())
+        finally:
+            pending.pop(req_id, None)
+
+    async def call(self, name, args, timeout=60):
+        await self._ensure()
+        return await self.request("tools/call", {"name": name, "arguments": args}, timeout)
+
+    async def close(self):
+        """Let the child see EOF and exit; kill it if it does not."""
+        proc = self._proc
+        if proc is None or proc.returncode is not None:
+            return
+        proc.stdin.close()
+        try:
+            await asyncio.wait_for(proc.wait(), 5)
+        except asyncio.TimeoutError:
+            self._kill(proc)
+            await proc.wait()
+
+
+_dash = _AsyncDashMCP()
+
+
+async def call_dash(name, args, timeout=60):
+    """Call a dash tool without blocking the event loop; returns the result text."""
+    try:
+        resp = await _dash.call(name, args, timeout)
+    except (subprocess.TimeoutExpired, dash_rpc.DashMCPError) as e:
+        return dash_rpc.error_text(e)
+    return dash_rpc.response_text(resp)
 
 
 def build_prompt(messages):
@@ -98,35 +295,70 @@ async def main():
         cwd="/dash",
     )
 
-    # Delta tracking for partial messages
-    text_lens = {}   # block_index -> chars emitted
-    think_lens = {}  # block_index -> chars emitted
-    seen_tools = set()
+    # Delta tracking for partial messages. Raw stream events carry pure
+    # deltas; AssistantMessage snapshots repeat the whole block, so for
+    # those only the unseen tail is emitted.
+    text_lens: list[int] = []   # block_index -> chars emitted
+    think_lens: list[int] = []  # block_index -> chars emitted
+    seen_tools = set()  # tool_use ids; the CLI may send each block as its own message
+    streamed = False  # current message arrived as deltas
     was_assistant = False
 
     try:
         async for message in query(prompt=prompt, options=options):
+            if StreamEvent is not None and isinstance(message, StreamEvent):
+                event = message.event
+                etype = event.get("type")
+                if etype == "message_start":
+                    text_lens.clear()
+                    think_lens.clear()
+                    seen_tools.clear()
+                    streamed = False
+                    was_assistant = True
+                elif etype == "content_block_delta":
+                    delta = event.get("delta", {})
+                    if delta.get("type") == "text_delta":
+                        emit({"choices": [{"delta": {"content": delta.get("text", "")}}]})
+                        streamed = True
+                    elif delta.get("type") == "thinking_delta":
+                        emit({"choices": [{"delta": {"reasoning": delta.get("thinking", "")}}]})
+                        streamed = True
+                continue
+
             if isinstance(message, AssistantMessage):
                 if not was_assistant:
                     text_lens.clear()
                     think_lens.clear()
                     seen_tools.clear()
+                    streamed = False
                 was_assistant = True
 
                 for i, block in enumerate(message.content):
                     if isinstance(block, TextBlock):
-                        prev = text_lens.get(i, 0)
-                        if len(block.text) > prev:
-                            emit({"choices": [{"delta": {"content": block.text[prev:]}}]})
-                            text_lens[i] = len(block.text)
+                        if streamed:
+                            continue
+                        if i >= len(text_lens):
+                            text_lens.extend([0] * (i + 1 - len(text_lens)))
+                        t = block.text
+                        n = len(t)
+                        prev = text_lens[i]
+                        if n > prev:
+                            emit({"choices": [{"delta": {"content": t[prev:]}}]})
+                            text_lens[i] = n
                     elif isinstance(block, ThinkingBlock):
-                        prev = think_lens.get(i, 0)
-                        if len(block.thinking) > prev:
-                            emit({"choices": [{"delta": {"reasoning": block.thinking[prev:]}}]})
-                            think_lens[i] = len(block.thinking)
+                        if streamed:
+                            continue
+                        if i >= len(think_lens):
+                            think_lens.extend([0] * (i + 1 - len(think_lens)))
+                        t = block.thinking
+                        n = len(t)
+                        prev = think_lens[i]
+                        if n > prev:
+                            emit({"choices": [{"delta": {"reasoning": t[prev:]}}]})
+                            think_lens[i] = n
                     elif isinstance(block, ToolUseBlock):
-                        if i not in seen_tools:
-                            seen_tools.add(i)
+                        if block.id not in seen_tools:
+                            seen_tools.add(block.id)
                             # Emit as OpenAI-format tool call for Go-side execution
                             emit({"choices": [{"delta": {
                                 "tool_calls": [{
@@ -155,5 +387,15 @@ async def main():
     emit_done()
 
 
+async def _run():
+    try:
+        await main()
+    finally:
+        await _dash.close()
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(_run())
+    finally:
+        _emitter.flush()
@@ -0,0 +1,56 @@
+"""dashmcp JSON-RPC framing and result helpers shared by agent.py and agent_bridge.py."""
+
+import json
+import subprocess
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is slower but equivalent
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    """Encode obj as compact UTF-8 JSON bytes, no trailing newline.
+
+    Used for dashmcp frames and the bridge's SSE events. Non-ASCII text is
+    kept as is, like orjson does.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+loads = orjson.loads if orjson is not None else json.loads
+
+
+class DashMCPError(Exception):
+    """dashmcp could not be started or stopped answering."""
+
+    def __init__(self, message: str, stderr: str = ""):
+        super().__init__(message)
+        self.stderr = stderr
+
+
+def result_text(result: dict) -> str:
+    """Extract text content from an MCP tool result."""
+    content = result.get("content", [])
+    if len(content) == 1 and content[0].get("type") == "text":
+        return content[0]["text"]  # the usual case: one text block
+    texts = [item["text"] for item in content if item.get("type") == "text"]
+    return "\n".join(texts) if texts else json.dumps(result)
+
+
+def response_text(resp: dict) -> str:
+    """Extract the text of a tools/call JSON-RPC response, or its error."""
+    if "error" in resp:
+        return json.dumps(resp["error"])
+    return result_text(resp.get("result", {}))
+
+
+def error_text(exc: BaseException) -> str:
+    """Format a failed dashmcp call as the tool result text."""
+    if isinstance(exc, subprocess.TimeoutExpired):
+        return json.dumps({"error": f"Tool call timed out after {exc.timeout:g}s"})
+    if isinstance(exc, DashMCPError):
+        return json.dumps({"error": str(exc), "stderr": exc.stderr})
+    return json.dumps({"error": str(exc)})
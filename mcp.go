@@ -9,6 +9,8 @@ import (
 	"fmt"
 	"io"
 	"os"
+	"sync"
+	"sync/atomic"
 )
 
 // MCP JSON-RPC 2.0 types
@@ -59,6 +61,19 @@ type mcpToolCallParams struct {
 	Arguments map[string]any `json:"arguments"`
 }
 
+// mcpBatchCallParams runs several tools/call requests in one round-trip.
+// MaxConcurrent <= 0 runs all calls at once; StopOnError skips calls not yet
+// started once one has failed.
+type mcpBatchCallParams struct {
+	Calls         []mcpToolCallParams `json:"calls"`
+	MaxConcurrent int                 `json:"maxConcurrent,omitempty"`
+	StopOnError   bool                `json:"stopOnError,omitempty"`
+}
+
+type mcpBatchCallResult struct {
+	Results []mcpToolResult `json:"results"`
+}
+
 type mcpToolResult struct {
 	Content []mcpContent `json:"content"`
 	IsError bool         `json:"isError,omitempty"`
@@ -69,11 +84,15 @@ type mcpContent struct {
 	Text string `json:"text"`
 }
 
-// MCPServer handles MCP protocol communication
+// MCPServer handles MCP protocol communication.
+// Tool calls run concurrently, so clients may pipeline several requests and
+// match the responses by id.
 type MCPServer struct {
-	dash   *Dash
-	reader *bufio.Reader
-	writer io.Writer
+	dash     *Dash
+	reader   *bufio.Reader
+	writer   io.Writer
+	writeMu  sync.Mutex     // one response line at a time
+	inflight sync.WaitGroup // running tools/call and batch/call handlers
 }
 
 // NewMCPServer creates a new MCP server
@@ -87,6 +106,8 @@ func NewMCPServer(d *Dash) *MCPServer {
 
 // Run starts the MCP server loop
 func (s *MCPServer) Run(ctx context.Context) error {
+	defer s.inflight.Wait()
+
 	for {
 		select {
 		case <-ctx.Done():
@@ -125,12 +146,24 @@ func (s *MCPServer) handleRequest(ctx context.Context, req *jsonRPCRequest) {
 	case "tools/list":
 		s.handleToolsList(req)
 	case "tools/call":
-		s.handleToolsCall(ctx, req)
+		s.goHandle(func() { s.handleToolsCall(ctx, req) })
+	case "batch/call":
+		s.goHandle(func() { s.handleBatchCall(ctx, req) })
 	default:
 		s.sendError(req.ID, -32601, "Method not found", req.Method)
 	}
 }
 
+// goHandle runs a request handler in its own goroutine and tracks it so Run
+// can wait for pending responses before returning.
+func (s *MCPServer) goHandle(fn func()) {
+	s.inflight.Add(1)
+	go func() {
+		defer s.inflight.Done()
+		fn()
+	}()
+}
+
 func (s *MCPServer) handleInitialize(req *jsonRPCRequest) {
 	result := mcpInitializeResult{
 		ProtocolVersion: "2024-11-05",
@@ -164,20 +197,66 @@ func (s *MCPServer) handleToolsCall(ctx context.Context, req *jsonRPCRequest) {
 		return
 	}
 
+	s.sendResult(req.ID, s.toolCallResult(ctx, params))
+}
+
+func (s *MCPServer) handleBatchCall(ctx context.Context, req *jsonRPCRequest) {
+	var params mcpBatchCallParams
+	if err := json.Unmarshal(req.Params, &params); err != nil {
+		s.sendError(req.ID, -32602, "Invalid params", err.Error())
+		return
+	}
+
+	limit := params.MaxConcurrent
+	if limit <= 0 || limit > len(params.Calls) {
+		limit = len(params.Calls)
+	}
+
+	results := make([]mcpToolResult, len(params.Calls))
+	sem := make(chan struct{}, max(limit, 1))
+	var failed atomic.Bool
+	var wg sync.WaitGroup
+
+	for i, call := range params.Calls {
+		sem <- struct{}{}
+		if params.StopOnError && failed.Load() {
+			<-sem
+			results[i] = mcpToolResult{
+				Content: []mcpContent{{Type: "text", Text: "Error: skipped after earlier failure in batch"}},
+				IsError: true,
+			}
+			continue
+		}
+		wg.Add(1)
+		go func(i int, call mcpToolCallParams) {
+			defer wg.Done()
+			defer func() { <-sem }()
+			results[i] = s.toolCallResult(ctx, call)
+			if results[i].IsError {
+				failed.Store(true)
+			}
+		}(i, call)
+	}
+	wg.Wait()
+
+	s.sendResult(req.ID, mcpBatchCallResult{Results: results})
+}
+
+// toolCallResult runs one tool via RunTool and wraps the outcome as MCP content.
+func (s *MCPServer) toolCallResult(ctx context.Context, params mcpToolCallParams) mcpToolResult {
 	result := s.dash.RunTool(ctx, params.Name, params.Arguments, &ToolOpts{CallerID: "mcp"})
 
 	if !result.Success {
-		s.sendResult(req.ID, mcpToolResult{
+		return mcpToolResult{
 			Content: []mcpContent{{Type: "text", Text: fmt.Sprintf("Error: %s", result.Error)}},
 			IsError: true,
-		})
-		return
+		}
 	}
 
-	resultJSON, _ := json.MarshalIndent(result.Data, "", "  ")
-	s.sendResult(req.ID, mcpToolResult{
+	resultJSON, _ := json.Marshal(result.Data)
+	return mcpToolResult{
 		Content: []mcpContent{{Type: "text", Text: string(resultJSON)}},
-	})
+	}
 }
 
 // CallTool executes a tool by name with arguments via RunTool.
@@ -237,6 +316,8 @@ func (s *MCPServer) sendError(id any, code int, message, data string) {
 
 func (s *MCPServer) send(resp jsonRPCResponse) {
 	data, _ := json.Marshal(resp)
+	s.writeMu.Lock()
+	defer s.writeMu.Unlock()
 	fmt.Fprintf(s.writer, "%s\n", data)
 }
 
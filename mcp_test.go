@@ -0,0 +1,118 @@
+package dash
+
+import (
+	"bytes"
+	"context"
+	"encoding/json"
+	"errors"
+	"testing"
+)
+
+func newBatchTestServer(t *testing.T) (*MCPServer, *bytes.Buffer) {
+	t.Helper()
+	reg := NewToolRegistry()
+	reg.Register(&ToolDef{
+		Name: "echo",
+		Fn: func(ctx context.Context, d *Dash, args map[string]any) (any, error) {
+			return args, nil
+		},
+	})
+	reg.Register(&ToolDef{
+		Name: "fail",
+		Fn: func(ctx context.Context, d *Dash, args map[string]any) (any, error) {
+			return nil, errors.New("boom")
+		},
+	})
+	out := &bytes.Buffer{}
+	return &MCPServer{dash: &Dash{registry: reg}, writer: out}, out
+}
+
+func runBatch(t *testing.T, params mcpBatchCallParams) []mcpToolResult {
+	t.Helper()
+	s, out := newBatchTestServer(t)
+	raw, _ := json.Marshal(params)
+	s.handleRequest(context.Background(), &jsonRPCRequest{JSONRPC: "2.0", ID: 7, Method: "batch/call", Params: raw})
+	s.inflight.Wait()
+
+	var resp struct {
+		ID     int                `json:"id"`
+		Result mcpBatchCallResult `json:"result"`
+	}
+	if err := json.Unmarshal(out.Bytes(), &resp); err != nil {
+		t.Fatalf("unmarshal response: %v (%s)", err, out.String())
+	}
+	if resp.ID != 7 {
+		t.Errorf("id = %d, want 7", resp.ID)
+	}
+	return resp.Result.Results
+}
+
+func TestBatchCallPreservesOrder(t *testing.T) {
+	results := runBatch(t, mcpBatchCallParams{
+		Calls: []mcpToolCallParams{
+			{Name: "echo", Arguments: map[string]any{"n": 1}},
+			{Name: "fail"},
+			{Name: "echo", Arguments: map[string]any{"n": 3}},
+		},
+	})
+	if len(results) != 3 {
+		t.Fatalf("got %d results, want 3", len(results))
+	}
+	if results[0].IsError || results[2].IsError {
+		t.Errorf("echo calls should succeed: %+v", results)
+	}
+	if !results[1].IsError {
+		t.Errorf("fail call should be an error")
+	}
+	if !bytes.Contains([]byte(results[2].Content[0].Text), []byte(`"n":3`)) {
+		t.Errorf("result 2 = %q, want echo of n=3", results[2].Content[0].Text)
+	}
+}
+
+func TestBatchCallStopOnError(t *testing.T) {
+	results := runBatch(t, mcpBatchCallParams{
+		Calls: []mcpToolCallParams{
+			{Name: "fail"},
+			{Name: "echo", Arguments: map[string]any{"n": 2}},
+		},
+		MaxConcurrent: 1,
+		StopOnError:   true,
+	})
+	if len(results) != 2 {
+		t.Fatalf("got %d results, want 2", len(results))
+	}
+	if !results[1].IsError || results[1].Content[0].Text != "Error: skipped after earlier failure in batch" {
+		t.Errorf("second call should be skipped, got %+v", results[1])
+	}
+}
+
+func TestBatchCallEmpty(t *testing.T) {
+	if results := runBatch(t, mcpBatchCallParams{}); len(results) != 0 {
+		t.Errorf("got %d results, want 0", len(results))
+	}
+}
+
+func TestToolsCallPipelined(t *testing.T) {
+	s, out := newBatchTestServer(t)
+	for i := 1; i <= 3; i++ {
+		raw, _ := json.Marshal(mcpToolCallParams{Name: "echo", Arguments: map[string]any{"n": i}})
+		s.handleRequest(context.Background(), &jsonRPCRequest{JSONRPC: "2.0", ID: i, Method: "tools/call", Params: raw})
+	}
+	s.inflight.Wait()
+
+	seen := map[int]bool{}
+	for _, line := range bytes.Split(bytes.TrimSpace(out.Bytes()), []byte("\n")) {
+		var resp struct {
+			ID int `json:"id"`
+		}
+		if err := json.Unmarshal(line, &resp); err != nil {
+			t.Fatalf("response line %q: %v", line, err)
+		}
+		seen[resp.ID] = true
+	}
+	for i := 1; i <= 3; i++ {
+		if !seen[i] {
+			t.Errorf("missing response for id %d", i)
+		}
+	}
+}
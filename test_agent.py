@@ -0,0 +1,87 @@
+"""Tests for agent._DashMCP and the tool helpers, run against testdata/stub_dashmcp.py."""
+
+import json
+import os
+import subprocess
+import sys
+import time
+import types
+import unittest
+from unittest import mock
+
+with mock.patch.dict(sys.modules, {"anthropic": types.ModuleType("anthropic")}):
+    import agent
+import dash_rpc
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata", "stub_dashmcp.py")
+
+
+class DashMCPTest(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(agent, "DASHMCP", STUB),
+            mock.patch.object(agent, "_dashmcp", agent._DashMCP()),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.addCleanup(lambda: agent._dashmcp.close())
+
+    def test_out_of_order_responses(self):
+        slow = agent.submit_tool("sleep", {"seconds": 0.3, "tag": "slow"})
+        fast = agent.submit_tool("sleep", {"seconds": 0, "tag": "fast"})
+        self.assertEqual(json.loads(fast.result(5))["tag"], "fast")
+        self.assertFalse(slow.done())
+        self.assertEqual(json.loads(slow.result(5))["tag"], "slow")
+
+    def test_submit_does_not_wait_for_initialize(self):
+        with mock.patch.dict(os.environ, {"STUB_INIT_DELAY": "0.5"}):
+            start = time.monotonic()
+            fut = agent.submit_tool("echo", {"x": 1})
+            self.assertLess(time.monotonic() - start, 0.25)
+            self.assertEqual(json.loads(fut.result(5)), {"x": 1})
+
+    def test_wedged_child_is_killed_and_respawned(self):
+        dash = agent._dashmcp
+        futs = [dash.submit("tools/call", {"name": "hang", "arguments": {}}, 0.2)
+                for _ in range(dash.MAX_TIMEOUTS)]
+        first = dash.proc
+        for fut in futs:
+            self.assertIsInstance(fut.exception(5), subprocess.TimeoutExpired)
+        first.wait(5)  # killed after MAX_TIMEOUTS expiries in a row
+        for _ in range(50):  # the reader marks it dead once it sees EOF
+            if dash._dead:
+                break
+            time.sleep(0.02)
+        self.assertEqual(json.loads(agent.run_tool("echo", {"x": 1})), {"x": 1})
+        self.assertIsNot(dash.proc, first)
+
+    def test_single_timeout_keeps_child(self):
+        dash = agent._dashmcp
+        fut = dash.submit("tools/call", {"name": "hang", "arguments": {}}, 0.2)
+        self.assertIn("timed out after 0.2s", agent._tool_text(fut))
+        self.assertIsNone(dash.proc.poll())
+
+    @unittest.skipIf(dash_rpc.orjson is None, "stdlib json encodes wide ints")
+    def test_unencodable_argument(self):
+        text = agent.run_tool("echo", {"n": 2**70})
+        self.assertIn("Could not encode tools/call request", json.loads(text)["error"])
+        self.assertEqual(json.loads(agent.run_tool("echo", {"x": 1})), {"x": 1})
+
+    def test_dead_child_fails_pending_and_respawns(self):
+        text = agent.run_tool("exit", {})
+        self.assertEqual(json.loads(text)["error"], "No response from dashmcp")
+        self.assertEqual(json.loads(agent.run_tool("echo", {"x": 2})), {"x": 2})
+
+    def test_batch(self):
+        texts = agent.run_tools_batch([("remember", {"type": "todo", "text": "a"}), ("exec", {"command": "b"})], 1)
+        self.assertEqual([json.loads(t) for t in texts], [{"type": "todo", "text": "a"}, {"command": "b"}])
+
+    def test_batch_falls_back_without_batch_call(self):
+        with mock.patch.dict(os.environ, {"STUB_NO_BATCH": "1"}):
+            texts = agent.run_tools_batch([("echo", {"x": 1}), ("echo", {"x": 2})], 1)
+        self.assertEqual([json.loads(t) for t in texts], [{"x": 1}, {"x": 2}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+"""Tests for agent_bridge: SSE translation against a stubbed SDK, and the
+dashmcp client against testdata/stub_dashmcp.py."""
+
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+import types
+import unittest
+from unittest import mock
+
+
+class _Msg:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+def _stub_sdk():
+    sdk = types.ModuleType("claude_code_sdk")
+    for name in ("ClaudeCodeOptions", "AssistantMessage", "ResultMessage", "TextBlock",
+                 "ThinkingBlock", "ToolUseBlock", "StreamEvent"):
+        setattr(sdk, name, type(name, (_Msg,), {}))
+    sdk.script = []
+
+    async def query(prompt, options):
+        for message in sdk.script:
+            yield message
+
+    sdk.query = query
+    return sdk
+
+
+sdk = _stub_sdk()
+with mock.patch.dict(sys.modules, {"claude_code_sdk": sdk}):
+    import agent_bridge
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata", "stub_dashmcp.py")
+
+
+def run_bridge(script):
+    """Run main() over the scripted SDK messages and return the emitted events."""
+    sdk.script = script
+    events = []
+    with mock.patch.object(agent_bridge, "emit", events.append), \
+            mock.patch.object(agent_bridge, "emit_done", lambda *a: events.append("DONE")), \
+            mock.patch.object(sys, "stdin", io.StringIO('{"messages":[{"role":"user","content":"hi"}]}')):
+        asyncio.run(agent_bridge.main())
+    return events
+
+
+def tool_ids(events):
+    return [
+        call["id"]
+        for e in events if e != "DONE"
+        for choice in e["choices"]
+        for call in choice["delta"].get("tool_calls", [])
+    ]
+
+
+class TestToolCalls(unittest.TestCase):
+    def test_one_block_per_message(self):
+        # The CLI sends each content block as its own AssistantMessage, so
+        # every tool_use block sits at index 0.
+        ev = lambda **e: sdk.StreamEvent(event=e)
+        events = run_bridge([
+            ev(type="message_start"),
+            ev(type="content_block_delta", index=0, delta={"type": "text_delta", "text": "Hej"}),
+            sdk.AssistantMessage(content=[sdk.TextBlock(text="Hej")]),
+            ev(type="content_block_start", index=1),
+            sdk.AssistantMessage(content=[sdk.ToolUseBlock(id="a", name="read", input={"path": "/x"})]),
+            ev(type="content_block_start", index=2),
+            sdk.AssistantMessage(content=[sdk.ToolUseBlock(id="b", name="read", input={"path": "/y"})]),
+            sdk.ResultMessage(usage=None),
+        ])
+        self.assertEqual(tool_ids(events), ["a", "b"])
+        self.assertEqual(events[0], {"choices": [{"delta": {"content": "Hej"}}]})
+
+    def test_snapshot_repeats_tool_once(self):
+        block = sdk.ToolUseBlock(id="a", name="read", input={})
+        events = run_bridge([
+            sdk.AssistantMessage(content=[sdk.TextBlock(text="x"), block]),
+            sdk.AssistantMessage(content=[sdk.TextBlock(text="x"), block]),
+            sdk.ResultMessage(usage=None),
+        ])
+        self.assertEqual(tool_ids(events), ["a"])
+
+
+def run_dash(fn, dashmcp=STUB):
+    """Await fn() with a fresh dashmcp client, closing the child afterwards."""
+    async def run():
+        try:
+            return await fn()
+        finally:
+            await agent_bridge._dash.close()
+
+    with mock.patch.object(agent_bridge, "DASHMCP", dashmcp), \
+            mock.patch.object(agent_bridge, "_dash", agent_bridge._AsyncDashMCP()):
+        return asyncio.run(run())
+
+
+class TestCallDash(unittest.TestCase):
+    def test_concurrent_calls(self):
+        async def calls():
+            start = time.monotonic()
+            texts = await asyncio.gather(*(
+                agent_bridge.call_dash("sleep", {"seconds": 0.3, "n": n}) for n in range(3)
+            ))
+            return texts, time.monotonic() - start
+
+        texts, elapsed = run_dash(calls)
+        self.assertEqual([json.loads(t)["n"] for t in texts], [0, 1, 2])
+        self.assertLess(elapsed, 0.8)  # pipelined, not one after another
+
+    def test_timeout(self):
+        async def calls():
+            text = await agent_bridge.call_dash("hang", {}, timeout=0.2)
+            first = agent_bridge._dash._proc
+            after = await agent_bridge.call_dash("echo", {"x": 1})
+            return text, after, first is agent_bridge._dash._proc
+
+        text, after, same = run_dash(calls)
+        self.assertIn("timed out after 0.2s", json.loads(text)["error"])
+        self.assertEqual(json.loads(after), {"x": 1})
+        self.assertTrue(same)  # one slow call does not cost the child
+
+    def test_dead_child_respawns(self):
+        async def calls():
+            text = await agent_bridge.call_dash("exit", {})
+            first = agent_bridge._dash._proc
+            after = await agent_bridge.call_dash("echo", {"x": 1})
+            return text, after, first is agent_bridge._dash._proc
+
+        text, after, same = run_dash(calls)
+        self.assertEqual(json.loads(text)["error"], "No response from dashmcp")
+        self.assertEqual(json.loads(after), {"x": 1})
+        self.assertFalse(same)
+
+    def test_failed_spawn(self):
+        text = run_dash(lambda: agent_bridge.call_dash("echo", {}), dashmcp="/nonexistent/dashmcp")
+        self.assertIn("Could not start dashmcp", json.loads(text)["error"])
+
+    def test_unencodable_argument(self):
+        text = run_dash(lambda: agent_bridge.call_dash("echo", {"x": {1, 2}}))
+        self.assertIn("Could not encode tools/call request", json.loads(text)["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
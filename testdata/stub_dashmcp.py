@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Stand-in dashmcp for the Python client tests.
+
+Speaks newline-delimited JSON-RPC like the real server and answers
+tools/call concurrently, so responses can arrive out of order. Tools:
+
+  echo   returns its arguments as JSON text
+  sleep  echo after args["seconds"]
+  hang   never answers
+  exit   exits the process without answering
+
+STUB_INIT_DELAY delays the initialize answer; STUB_NO_BATCH makes
+batch/call an unknown method, like an older dashmcp.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+write_lock = threading.Lock()
+
+
+def send(resp):
+    with write_lock:
+        sys.stdout.write(json.dumps(resp) + "\n")
+        sys.stdout.flush()
+
+
+def text(args):
+    return {"content": [{"type": "text", "text": json.dumps(args, sort_keys=True)}]}
+
+
+def call(req_id, params):
+    name, args = params.get("name"), params.get("arguments") or {}
+    if name == "hang":
+        return
+    if name == "exit":
+        os._exit(3)
+    if name == "sleep":
+        time.sleep(args.get("seconds", 0))
+    send({"jsonrpc": "2.0", "id": req_id, "result": text(args)})
+
+
+for line in sys.stdin:
+    req = json.loads(line)
+    method, params = req.get("method"), req.get("params") or {}
+    if method == "initialize":
+        time.sleep(float(os.environ.get("STUB_INIT_DELAY", 0)))
+        send({"jsonrpc": "2.0", "id": req["id"], "result": {}})
+    elif method == "tools/call":
+        threading.Thread(target=call, args=(req["id"], params), daemon=True).start()
+    elif method == "batch/call" and not os.environ.get("STUB_NO_BATCH"):
+        results = [text(c.get("arguments") or {}) for c in params.get("calls", [])]
+        send({"jsonrpc": "2.0", "id": req["id"], "result": {"results": results}})
+    else:
+        send({"jsonrpc": "2.0", "id": req["id"], "error": {"code": -32601, "message": "Method not found"}})